@@ -102,27 +102,27 @@ interface MiniDataCounterProps {
   className?: string;
 }
 
-export function MiniDataCounter({ value, label, trend = 'neutral', className = '' }: MiniDataCounterProps) {
-  const trendColors = {
-    up: 'text-matrix-green',
-    down: 'text-error-crimson',
-    neutral: 'text-cyber-cyan',
-  };
+const miniTrendColors = {
+  up: 'text-matrix-green',
+  down: 'text-error-crimson',
+  neutral: 'text-cyber-cyan',
+};
 
-  const trendIcons = {
-    up: '▲',
-    down: '▼',
-    neutral: '—',
-  };
+const miniTrendIcons = {
+  up: '▲',
+  down: '▼',
+  neutral: '—',
+};
 
+export function MiniDataCounter({ value, label, trend = 'neutral', className = '' }: MiniDataCounterProps) {
   return (
     <div className={`flex items-center justify-between py-2 px-3 bg-steel-gray/30 rounded border border-terminal-gray/30 ${className}`}>
       <span className="font-mono text-[10px] text-ghost-white tracking-wider uppercase">{label}</span>
       <div className="flex items-center gap-2">
-        <span className={`font-mono text-sm font-semibold ${trendColors[trend]}`}>
+        <span className={`font-mono text-sm font-semibold ${miniTrendColors[trend]}`}>
           {value.toLocaleString()}
         </span>
-        <span className={`text-[10px] ${trendColors[trend]}`}>{trendIcons[trend]}</span>
+        <span className={`text-[10px] ${miniTrendColors[trend]}`}>{miniTrendIcons[trend]}</span>
       </div>
     </div>
   );
@@ -15,6 +15,18 @@ interface RealTimePanelProps {
   className?: string;
 }
 
+const trendIcons = {
+  up: <TrendingUp className="w-3 h-3 text-matrix-green" />,
+  down: <TrendingDown className="w-3 h-3 text-error-crimson" />,
+  neutral: <Minus className="w-3 h-3 text-ghost-white" />,
+};
+
+const trendColors = {
+  up: 'text-matrix-green',
+  down: 'text-error-crimson',
+  neutral: 'text-ghost-white',
+};
+
 export default function RealTimePanel({ title = 'MÉTRICAS EN TIEMPO REAL', className = '' }: RealTimePanelProps) {
   const [data, setData] = useState<DataPoint[]>([
     { label: 'RESPUESTAS/HR', value: 847, suffix: '', trend: 'up', change: 12 },
@@ -94,18 +106,6 @@ export default function RealTimePanel({ title = 'MÉTRICAS EN TIEMPO REAL', clas
     ctx.fill();
   }, [sparklineData]);
 
-  const trendIcons = {
-    up: <TrendingUp className="w-3 h-3 text-matrix-green" />,
-    down: <TrendingDown className="w-3 h-3 text-error-crimson" />,
-    neutral: <Minus className="w-3 h-3 text-ghost-white" />,
-  };
-
-  const trendColors = {
-    up: 'text-matrix-green',
-    down: 'text-error-crimson',
-    neutral: 'text-ghost-white',
-  };
-
   return (
     <div className={`bg-deep-void border border-terminal-gray/50 rounded-lg p-4 ${className}`}>
       {/* Header */}
@@ -186,11 +186,11 @@ export default function Automations() {
     loadAutomations();
   };
 
+  const normalizedQuery = searchQuery.toLowerCase();
   const filteredAutomations = automations.filter(automation => {
-    const matchesFilter = filter === 'all' || automation.status === filter;
-    const matchesSearch = automation.name.toLowerCase().includes(searchQuery.toLowerCase()) ||
-                         automation.description.toLowerCase().includes(searchQuery.toLowerCase());
-    return matchesFilter && matchesSearch;
+    if (filter !== 'all' && automation.status !== filter) return false;
+    return automation.name.toLowerCase().includes(normalizedQuery) ||
+           automation.description.toLowerCase().includes(normalizedQuery);
   });
 
   const stats = {
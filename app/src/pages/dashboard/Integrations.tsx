@@ -323,11 +323,11 @@ export default function Integrations() {
     await loadIntegrations();
   };
 
+  const normalizedQuery = searchQuery.toLowerCase();
   const filteredIntegrations = integrations.filter(integration => {
-    const matchesFilter = filter === 'all' || integration.status === filter;
-    const matchesSearch = integration.name.toLowerCase().includes(searchQuery.toLowerCase()) ||
-                         integration.provider.toLowerCase().includes(searchQuery.toLowerCase());
-    return matchesFilter && matchesSearch;
+    if (filter !== 'all' && integration.status !== filter) return false;
+    return integration.name.toLowerCase().includes(normalizedQuery) ||
+           integration.provider.toLowerCase().includes(normalizedQuery);
   });
 
   const stats = {
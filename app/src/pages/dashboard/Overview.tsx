@@ -69,28 +69,28 @@ function KPICard({
   );
 }
 
-function ActivityItem({ event }: { event: { id: string; type: string; title: string; description: string; timestamp: string; status: string } }) {
-  const statusIcons = {
-    success: <CheckCircle2 className="w-4 h-4 text-matrix-green" />,
-    error: <AlertCircle className="w-4 h-4 text-error-crimson" />,
-    pending: <Clock3 className="w-4 h-4 text-alert-amber" />,
-    warning: <AlertCircle className="w-4 h-4 text-alert-amber" />,
-  };
+const activityStatusIcons = {
+  success: <CheckCircle2 className="w-4 h-4 text-matrix-green" />,
+  error: <AlertCircle className="w-4 h-4 text-error-crimson" />,
+  pending: <Clock3 className="w-4 h-4 text-alert-amber" />,
+  warning: <AlertCircle className="w-4 h-4 text-alert-amber" />,
+};
 
-  const typeColors: Record<string, string> = {
-    automation: 'text-cyber-cyan',
-    task: 'text-neon-purple',
-    integration: 'text-matrix-green',
-    alert: 'text-error-crimson',
-    approval: 'text-alert-amber',
-  };
+const activityTypeColors: Record<string, string> = {
+  automation: 'text-cyber-cyan',
+  task: 'text-neon-purple',
+  integration: 'text-matrix-green',
+  alert: 'text-error-crimson',
+  approval: 'text-alert-amber',
+};
 
+function ActivityItem({ event }: { event: { id: string; type: string; title: string; description: string; timestamp: string; status: string } }) {
   return (
     <div className="flex items-start gap-3 p-3 hover:bg-cyber-cyan/5 rounded-lg transition-colors">
-      {statusIcons[event.status as keyof typeof statusIcons] || <Activity className="w-4 h-4 text-ghost-white" />}
+      {activityStatusIcons[event.status as keyof typeof activityStatusIcons] || <Activity className="w-4 h-4 text-ghost-white" />}
       <div className="flex-1 min-w-0">
         <div className="flex items-center gap-2">
-          <span className={`text-[10px] font-mono uppercase ${typeColors[event.type] || 'text-ghost-white'}`}>
+          <span className={`text-[10px] font-mono uppercase ${activityTypeColors[event.type] || 'text-ghost-white'}`}>
             {event.type}
           </span>
           <span className="text-[10px] text-terminal-gray">
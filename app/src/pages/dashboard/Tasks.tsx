@@ -297,11 +297,11 @@ export default function Tasks() {
     loadTasks();
   };
 
+  const normalizedQuery = searchQuery.toLowerCase();
   const filteredTasks = tasks.filter(task => {
-    const matchesFilter = filter === 'all' || task.status === filter;
-    const matchesSearch = task.name.toLowerCase().includes(searchQuery.toLowerCase()) ||
-                         task.description.toLowerCase().includes(searchQuery.toLowerCase());
-    return matchesFilter && matchesSearch;
+    if (filter !== 'all' && task.status !== filter) return false;
+    return task.name.toLowerCase().includes(normalizedQuery) ||
+           task.description.toLowerCase().includes(normalizedQuery);
   });
 
   const stats = {
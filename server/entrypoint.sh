@@ -26,4 +26,4 @@ if [ "${SEED_DEMO:-true}" = "true" ] || [ "${SEED_DEMO:-1}" = "1" ]; then
 fi
 
 echo "[boot] start server"
-node dist/index.js
+exec node dist/index.js
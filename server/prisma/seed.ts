@@ -1,8 +1,11 @@
 import 'dotenv/config';
 import bcrypt from 'bcryptjs';
+import { z } from 'zod';
 import { PrismaClient, type Plan, type OrgStatus, type HealthStatus, type WorkflowStatus, type IntegrationStatus, type ApprovalStatus } from '@prisma/client';
 
 const prisma = new PrismaClient();
+// Same rule as env.ts (src/ isn't shipped in the runtime image), so seeded hashes match the server's cost
+const BCRYPT_ROUNDS = z.coerce.number().int().min(4).max(31).default(12).parse(process.env.BCRYPT_ROUNDS);
 
 function daysFromNow(days: number) {
   return new Date(Date.now() + days * 24 * 60 * 60 * 1000);
@@ -18,7 +21,7 @@ async function upsertUser(input: {
   password: string;
   systemRole?: 'NONE' | 'SUPER_ADMIN';
 }) {
-  const passwordHash = await bcrypt.hash(input.password, 12);
+  const passwordHash = await bcrypt.hash(input.password, BCRYPT_ROUNDS);
   return prisma.user.upsert({
     where: { email: input.email.toLowerCase() },
     update: { name: input.name, passwordHash, systemRole: input.systemRole ?? 'NONE', isActive: true },
@@ -0,0 +1,46 @@
+import { Prisma } from '@prisma/client';
+import { prisma } from './prisma.js';
+
+const FLUSH_INTERVAL_MS = 200;
+const MAX_BATCH_SIZE = 500;
+
+let pending: Prisma.AuditLogCreateManyInput[] = [];
+let flushTimer: NodeJS.Timeout | null = null;
+const inFlight = new Set<Promise<void>>();
+
+export function enqueueAuditLog(entry: Prisma.AuditLogCreateManyInput) {
+  pending.push(entry);
+  if (pending.length >= MAX_BATCH_SIZE) {
+    void flushAuditLogs();
+    return;
+  }
+  if (!flushTimer) {
+    flushTimer = setTimeout(() => void flushAuditLogs(), FLUSH_INTERVAL_MS);
+    flushTimer.unref();
+  }
+}
+
+export async function flushAuditLogs() {
+  if (flushTimer) {
+    clearTimeout(flushTimer);
+    flushTimer = null;
+  }
+  if (pending.length > 0) {
+    const batch = pending;
+    pending = [];
+    const write = writeAuditBatch(batch).finally(() => inFlight.delete(write));
+    inFlight.add(write);
+  }
+  await Promise.all(inFlight);
+}
+
+async function writeAuditBatch(batch: Prisma.AuditLogCreateManyInput[]) {
+  try {
+    await prisma.auditLog.createMany({ data: batch });
+  } catch (err) {
+    // A dangling FK fails the whole INSERT; retry row by row so only the bad rows are lost
+    if (err instanceof Prisma.PrismaClientKnownRequestError && err.code === 'P2003') {
+      await Promise.allSettled(batch.map((data) => prisma.auditLog.create({ data })));
+    }
+  }
+}
@@ -6,6 +6,8 @@ import { hasPermission, permissionsForRoles, type Permission } from './permissio
 import { randomToken, sha256 } from './security.js';
 
 export const SESSION_COOKIE_NAME = 'kanlogic_session';
+const SESSION_TTL_MS = env.SESSION_TTL_DAYS * 24 * 60 * 60 * 1000;
+const LAST_SEEN_WRITE_INTERVAL_MS = 60_000;
 
 export type AuthedRequest = Request & {
   auth: {
@@ -14,39 +16,34 @@ export type AuthedRequest = Request & {
     organizationId: string;
     systemRole: 'NONE' | 'SUPER_ADMIN';
     orgRole: 'ORG_ADMIN' | 'ORG_USER' | null;
-    permissions: Permission[];
+    permissions: readonly Permission[];
     isImpersonating: boolean;
     impersonatorUserId: string | null;
   };
 };
 
-function cookieOptions() {
-  const isSecure = env.COOKIE_SECURE;
-  return {
-    httpOnly: true,
-    secure: isSecure,
-    sameSite: 'lax' as const,
-    path: '/',
-  };
-}
+const SESSION_COOKIE_OPTIONS = {
+  httpOnly: true,
+  secure: env.COOKIE_SECURE,
+  sameSite: 'lax' as const,
+  path: '/',
+};
 
 export function setSessionCookie(res: Response, token: string, expiresAt: Date) {
   res.cookie(SESSION_COOKIE_NAME, token, {
-    ...cookieOptions(),
+    ...SESSION_COOKIE_OPTIONS,
     expires: expiresAt,
   });
 }
 
 export function clearSessionCookie(res: Response) {
-  res.clearCookie(SESSION_COOKIE_NAME, {
-    ...cookieOptions(),
-  });
+  res.clearCookie(SESSION_COOKIE_NAME, SESSION_COOKIE_OPTIONS);
 }
 
 export async function createSession(params: { userId: string; organizationId: string }) {
   const token = randomToken(32);
   const tokenHash = sha256(token);
-  const expiresAt = new Date(Date.now() + env.SESSION_TTL_DAYS * 24 * 60 * 60 * 1000);
+  const expiresAt = new Date(Date.now() + SESSION_TTL_MS);
   const session = await prisma.session.create({
     data: {
       tokenHash,
@@ -58,6 +55,21 @@ export async function createSession(params: { userId: string; organizationId: st
   return { session, token };
 }
 
+export async function startUserSession(res: Response, userId: string, now = new Date()) {
+  const membership = await prisma.membership.findFirst({
+    where: { userId },
+    orderBy: { createdAt: 'asc' },
+    select: { organizationId: true },
+  });
+  const organizationId = membership?.organizationId ?? 'org_system';
+
+  const [{ token, session }] = await Promise.all([
+    createSession({ userId, organizationId }),
+    prisma.user.update({ where: { id: userId }, data: { lastLoginAt: now }, select: { id: true } }),
+  ]);
+  setSessionCookie(res, token, session.expiresAt);
+}
+
 export async function destroySession(token: string) {
   const tokenHash = sha256(token);
   await prisma.session.deleteMany({ where: { tokenHash } });
@@ -68,9 +80,21 @@ export async function requireAuth(req: Request, res: Response, next: NextFunctio
   if (!token || typeof token !== 'string') return res.status(401).json({ error: 'UNAUTHENTICATED' });
 
   const tokenHash = sha256(token);
-  const session = await prisma.session.findUnique({ where: { tokenHash } });
+  const session = await prisma.session.findUnique({
+    where: { tokenHash },
+    select: {
+      id: true,
+      userId: true,
+      organizationId: true,
+      impersonatedUserId: true,
+      impersonatedOrgId: true,
+      expiresAt: true,
+      lastSeenAt: true,
+    },
+  });
   if (!session) return res.status(401).json({ error: 'UNAUTHENTICATED' });
-  if (session.expiresAt.getTime() <= Date.now()) {
+  const now = Date.now();
+  if (session.expiresAt.getTime() <= now) {
     await prisma.session.delete({ where: { id: session.id } }).catch(() => {});
     return res.status(401).json({ error: 'SESSION_EXPIRED' });
   }
@@ -80,9 +104,10 @@ export async function requireAuth(req: Request, res: Response, next: NextFunctio
   const effectiveOrgId = session.impersonatedOrgId ?? session.organizationId;
 
   const [user, membership] = await Promise.all([
-    prisma.user.findUnique({ where: { id: effectiveUserId } }),
+    prisma.user.findUnique({ where: { id: effectiveUserId }, select: { systemRole: true, isActive: true } }),
     prisma.membership.findUnique({
       where: { userId_organizationId: { userId: effectiveUserId, organizationId: effectiveOrgId } },
+      select: { role: true },
     }),
   ]);
 
@@ -95,10 +120,14 @@ export async function requireAuth(req: Request, res: Response, next: NextFunctio
   const orgRole = membership?.role ?? null;
   const permissions = permissionsForRoles(user.systemRole, orgRole);
 
-  await prisma.session.update({
-    where: { id: session.id },
-    data: { lastSeenAt: new Date() },
-  });
+  if (now - session.lastSeenAt.getTime() >= LAST_SEEN_WRITE_INTERVAL_MS) {
+    void prisma.session
+      .update({
+        where: { id: session.id },
+        data: { lastSeenAt: new Date(now) },
+      })
+      .catch(() => {});
+  }
 
   (req as AuthedRequest).auth = {
     sessionId: session.id,
@@ -122,6 +151,38 @@ export function requirePermission(permission: Permission) {
   };
 }
 
+export async function hashPassword(password: string) {
+  return bcrypt.hash(password, env.BCRYPT_ROUNDS);
+}
+
 export async function verifyPassword(password: string, passwordHash: string) {
   return bcrypt.compare(password, passwordHash);
 }
+
+// Hash of a throwaway password, compared against when the account has no hash so every miss costs one bcrypt
+const timingEqualizerHash = hashPassword(randomToken(16));
+
+export async function verifyPasswordOrDummy(password: string, passwordHash: string | null | undefined) {
+  if (!passwordHash) {
+    await bcrypt.compare(password, await timingEqualizerHash);
+    return false;
+  }
+  return verifyPassword(password, passwordHash);
+}
+
+export function passwordNeedsRehash(passwordHash: string) {
+  return bcrypt.getRounds(passwordHash) !== env.BCRYPT_ROUNDS;
+}
+
+export async function checkPasswordHashCost() {
+  // Let the import-time equalizer hash finish first; bcryptjs interleaves concurrent hashes and would skew the timing
+  await timingEqualizerHash;
+  const startedAt = performance.now();
+  await hashPassword('calibration');
+  const elapsedMs = Math.round(performance.now() - startedAt);
+  if (elapsedMs < 50) {
+    console.warn(`[auth] BCRYPT_ROUNDS=${env.BCRYPT_ROUNDS} hashes in ${elapsedMs}ms; consider raising it`);
+  } else if (elapsedMs > 500) {
+    console.warn(`[auth] BCRYPT_ROUNDS=${env.BCRYPT_ROUNDS} hashes in ${elapsedMs}ms; consider lowering it`);
+  }
+}
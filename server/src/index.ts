@@ -1,31 +1,36 @@
 import fs from 'node:fs';
 import path from 'node:path';
 import express from 'express';
+import compression from 'compression';
 import cookieParser from 'cookie-parser';
 import cors from 'cors';
 import { z } from 'zod';
-import bcrypt from 'bcryptjs';
-import { Prisma } from '@prisma/client';
+import { Prisma, type Event as ActivityEvent, type TaskRunStatus } from '@prisma/client';
 import { env } from './env.js';
 import { prisma } from './prisma.js';
 import {
   AuthedRequest,
   SESSION_COOKIE_NAME,
+  checkPasswordHashCost,
   clearSessionCookie,
   createSession,
   destroySession,
+  hashPassword,
+  passwordNeedsRehash,
   requireAuth,
   requirePermission,
   setSessionCookie,
-  verifyPassword,
+  startUserSession,
+  verifyPasswordOrDummy,
 } from './auth.js';
-import { randomOtpCode, randomToken, sha256 } from './security.js';
-import { sseAddClient, sseBroadcast, ssePing, sseRemoveClient } from './realtime.js';
-import { permissionsForRoles } from './permissions.js';
+import { matchesSha256, randomOtpCode, randomToken, sha256 } from './security.js';
+import { SSE_HELLO_FRAME, sseAddClient, sseBroadcast, sseCloseAll, ssePing, sseRemoveClient } from './realtime.js';
+import { enqueueAuditLog, flushAuditLogs } from './audit.js';
 
 const app = express();
 app.set('trust proxy', 1);
 
+app.use(compression());
 app.use(express.json({ limit: '2mb' }));
 app.use(cookieParser());
 app.use(
@@ -37,35 +42,26 @@ app.use(
 
 // Best-effort audit log for authenticated, state-changing API calls
 app.use((req, res, next) => {
+  if (req.method === 'GET' || !req.path.startsWith('/api/')) return next();
   res.on('finish', () => {
-    void (async () => {
-      try {
-        const auth = (req as Partial<AuthedRequest>).auth;
-        if (!auth) return;
-        if (!req.path.startsWith('/api/')) return;
-        if (req.method === 'GET') return;
-        if (res.statusCode >= 500) return;
-        const rawUserAgent = req.headers['user-agent'];
-        const userAgent = Array.isArray(rawUserAgent) ? rawUserAgent.join(', ') : (rawUserAgent ?? 'unknown');
-        const ip = req.ip ?? req.socket.remoteAddress ?? 'unknown';
-
-        await prisma.auditLog.create({
-          data: {
-            organizationId: auth.organizationId,
-            actorUserId: auth.userId,
-            action: `${req.method} ${req.path}`,
-            resource: 'api',
-            resourceId: null,
-            ip,
-            userAgent,
-            severity: res.statusCode >= 400 ? 'medium' : 'low',
-            details: { statusCode: res.statusCode },
-          },
-        });
-      } catch {
-        // ignore
-      }
-    })();
+    const auth = (req as Partial<AuthedRequest>).auth;
+    if (!auth) return;
+    if (res.statusCode >= 500) return;
+    const rawUserAgent = req.headers['user-agent'];
+    const userAgent = Array.isArray(rawUserAgent) ? rawUserAgent.join(', ') : (rawUserAgent ?? 'unknown');
+    const ip = req.ip ?? req.socket.remoteAddress ?? 'unknown';
+
+    enqueueAuditLog({
+      organizationId: auth.organizationId,
+      actorUserId: auth.userId,
+      action: `${req.method} ${req.path}`,
+      resource: 'api',
+      resourceId: null,
+      ip,
+      userAgent,
+      severity: res.statusCode >= 400 ? 'medium' : 'low',
+      details: { statusCode: res.statusCode },
+    });
   });
   next();
 });
@@ -74,16 +70,24 @@ app.get('/api/health', (_req, res) => res.json({ ok: true }));
 
 // ---- Auth ----
 
+const emailField = z.string().trim().toLowerCase().email();
+
 app.get('/api/auth/me', requireAuth, async (req, res) => {
   const auth = (req as AuthedRequest).auth;
-  const user = await prisma.user.findUnique({ where: { id: auth.userId } });
-  if (!user) return res.status(401).json({ error: 'UNAUTHENTICATED' });
-
-  const org = await prisma.organization.findUnique({ where: { id: auth.organizationId } });
-  if (!org) return res.status(401).json({ error: 'UNAUTHENTICATED' });
+  const [user, org] = await Promise.all([
+    prisma.user.findUnique({
+      where: { id: auth.userId },
+      select: { id: true, email: true, name: true, lastLoginAt: true, createdAt: true },
+    }),
+    prisma.organization.findUnique({
+      where: { id: auth.organizationId },
+      select: { id: true, name: true, plan: true, status: true, createdAt: true },
+    }),
+  ]);
+  if (!user || !org) return res.status(401).json({ error: 'UNAUTHENTICATED' });
 
-  const role = user.systemRole === 'SUPER_ADMIN' ? 'SUPER_ADMIN' : auth.orgRole ?? 'ORG_USER';
-  const permissions = permissionsForRoles(user.systemRole, auth.orgRole);
+  const role = auth.systemRole === 'SUPER_ADMIN' ? 'SUPER_ADMIN' : auth.orgRole ?? 'ORG_USER';
+  const permissions = auth.permissions;
 
   res.json({
     user: {
@@ -105,60 +109,76 @@ app.get('/api/auth/me', requireAuth, async (req, res) => {
   });
 });
 
+const registerBody = z.object({
+  email: emailField,
+  password: z.string().min(8),
+  name: z.string().min(2),
+  orgName: z.string().min(2),
+});
+
 app.post('/api/auth/register', async (req, res) => {
-  const schema = z.object({
-    email: z.string().email(),
-    password: z.string().min(8),
-    name: z.string().min(2),
-    orgName: z.string().min(2),
-  });
-  const body = schema.parse(req.body);
+  const body = registerBody.parse(req.body);
 
-  const email = body.email.toLowerCase();
+  const { email } = body;
   const existing = await prisma.user.findUnique({ where: { email } });
   if (existing) return res.status(400).json({ error: 'EMAIL_IN_USE' });
 
-  const passwordHash = await bcrypt.hash(body.password, 12);
+  const passwordHash = await hashPassword(body.password);
   const org = await prisma.organization.create({
-    data: { name: body.orgName, plan: 'starter', status: 'trial' },
-  });
-  const user = await prisma.user.create({
-    data: { email, name: body.name, passwordHash, systemRole: 'NONE' },
+    data: {
+      name: body.orgName,
+      plan: 'starter',
+      status: 'trial',
+      memberships: {
+        create: {
+          role: 'ORG_ADMIN',
+          user: { create: { email, name: body.name, passwordHash, systemRole: 'NONE' } },
+        },
+      },
+    },
+    select: { id: true, memberships: { select: { userId: true } } },
   });
-  await prisma.membership.create({ data: { userId: user.id, organizationId: org.id, role: 'ORG_ADMIN' } });
+  const userId = org.memberships[0].userId;
 
-  const { token, session } = await createSession({ userId: user.id, organizationId: org.id });
+  const { token, session } = await createSession({ userId, organizationId: org.id });
   setSessionCookie(res, token, session.expiresAt);
 
   res.json({ ok: true });
 });
 
+const loginBody = z.object({ email: emailField, password: z.string().min(1) });
+
 app.post('/api/auth/login', async (req, res) => {
-  const schema = z.object({ email: z.string().email(), password: z.string().min(1) });
-  const body = schema.parse(req.body);
-  const email = body.email.toLowerCase();
-  const user = await prisma.user.findUnique({ where: { email } });
-  if (!user || !user.passwordHash) return res.status(400).json({ error: 'INVALID_CREDENTIALS' });
+  const body = loginBody.parse(req.body);
+  const { email } = body;
+  const user = await prisma.user.findUnique({
+    where: { email },
+    select: { id: true, passwordHash: true, isActive: true },
+  });
+  const ok = await verifyPasswordOrDummy(body.password, user?.passwordHash);
+  if (!user?.passwordHash || !ok) return res.status(400).json({ error: 'INVALID_CREDENTIALS' });
   if (!user.isActive) return res.status(400).json({ error: 'USER_DISABLED' });
 
-  const ok = await verifyPassword(body.password, user.passwordHash);
-  if (!ok) return res.status(400).json({ error: 'INVALID_CREDENTIALS' });
-
-  const membership = await prisma.membership.findFirst({ where: { userId: user.id }, orderBy: { createdAt: 'asc' } });
-  const orgId = membership?.organizationId ?? 'org_system';
-
-  const { token, session } = await createSession({ userId: user.id, organizationId: orgId });
-  setSessionCookie(res, token, session.expiresAt);
+  if (passwordNeedsRehash(user.passwordHash)) {
+    const verifiedHash = user.passwordHash;
+    // Only replace the hash we verified, so a password reset landing meanwhile isn't undone
+    void hashPassword(body.password)
+      .then((passwordHash) =>
+        prisma.user.updateMany({ where: { id: user.id, passwordHash: verifiedHash }, data: { passwordHash } }),
+      )
+      .catch(() => {});
+  }
 
-  await prisma.user.update({ where: { id: user.id }, data: { lastLoginAt: new Date() } });
+  await startUserSession(res, user.id);
 
   res.json({ ok: true });
 });
 
+const otpStartBody = z.object({ email: emailField });
+
 app.post('/api/auth/login/otp/start', async (req, res) => {
-  const schema = z.object({ email: z.string().email() });
-  const body = schema.parse(req.body);
-  const email = body.email.toLowerCase();
+  const body = otpStartBody.parse(req.body);
+  const { email } = body;
 
   const user = await prisma.user.findUnique({ where: { email } });
   if (!user) return res.json({ ok: true });
@@ -179,36 +199,57 @@ app.post('/api/auth/login/otp/start', async (req, res) => {
   res.json({ ok: true });
 });
 
-app.post('/api/auth/login/otp/verify', async (req, res) => {
-  const schema = z.object({ email: z.string().email(), code: z.string().length(6) });
-  const body = schema.parse(req.body);
-  const email = body.email.toLowerCase();
+const OTP_MAX_ATTEMPTS = 5;
+const OTP_ATTEMPT_WINDOW_MS = 15 * 60 * 1000;
+const OTP_MAX_ATTEMPTS_PER_WINDOW = 10;
 
-  const codeHash = sha256(body.code);
-  const otp = await prisma.otpCode.findFirst({
-    where: {
-      email,
-      codeHash,
-      consumedAt: null,
-      expiresAt: { gt: new Date() },
-    },
-    orderBy: { createdAt: 'desc' },
-  });
+const otpVerifyBody = z.object({ email: emailField, code: z.string().length(6) });
 
-  if (!otp) return res.status(400).json({ error: 'INVALID_OTP' });
+app.post('/api/auth/login/otp/verify', async (req, res) => {
+  const body = otpVerifyBody.parse(req.body);
+  const { email } = body;
+  const now = new Date();
+
+  const [otp, recent] = await Promise.all([
+    prisma.otpCode.findFirst({
+      where: {
+        email,
+        consumedAt: null,
+        expiresAt: { gt: now },
+      },
+      orderBy: { createdAt: 'desc' },
+    }),
+    prisma.otpCode.aggregate({
+      where: { email, createdAt: { gte: new Date(now.getTime() - OTP_ATTEMPT_WINDOW_MS) } },
+      _sum: { attempts: true },
+    }),
+  ]);
 
-  await prisma.otpCode.update({ where: { id: otp.id }, data: { consumedAt: new Date() } });
+  if (!otp) return res.status(400).json({ error: 'INVALID_OTP' });
+  // Requesting a fresh code resets the per-code cap, so also cap guesses per email across all recent codes
+  if ((recent._sum.attempts ?? 0) >= OTP_MAX_ATTEMPTS_PER_WINDOW) {
+    return res.status(400).json({ error: 'INVALID_OTP' });
+  }
 
-  const user = await prisma.user.findUnique({ where: { email } });
-  if (!user || !user.isActive) return res.status(400).json({ error: 'INVALID_OTP' });
+  // Reserve the guess atomically before comparing, so parallel requests can't exceed the cap
+  const reserved = await prisma.otpCode.updateMany({
+    where: { id: otp.id, consumedAt: null, attempts: { lt: OTP_MAX_ATTEMPTS } },
+    data: { attempts: { increment: 1 } },
+  });
+  if (reserved.count === 0) return res.status(400).json({ error: 'INVALID_OTP' });
+  if (!matchesSha256(otp.codeHash, body.code)) return res.status(400).json({ error: 'INVALID_OTP' });
 
-  const membership = await prisma.membership.findFirst({ where: { userId: user.id }, orderBy: { createdAt: 'asc' } });
-  const orgId = membership?.organizationId ?? 'org_system';
+  // Only the request that flips consumedAt gets a session
+  const consumed = await prisma.otpCode.updateMany({
+    where: { id: otp.id, consumedAt: null },
+    data: { consumedAt: now },
+  });
+  if (consumed.count !== 1) return res.status(400).json({ error: 'INVALID_OTP' });
 
-  const { token, session } = await createSession({ userId: user.id, organizationId: orgId });
-  setSessionCookie(res, token, session.expiresAt);
+  const user = await prisma.user.findUnique({ where: { email }, select: { id: true, isActive: true } });
+  if (!user || !user.isActive) return res.status(400).json({ error: 'INVALID_OTP' });
 
-  await prisma.user.update({ where: { id: user.id }, data: { lastLoginAt: new Date() } });
+  await startUserSession(res, user.id, now);
 
   res.json({ ok: true });
 });
@@ -220,10 +261,11 @@ app.post('/api/auth/logout', async (req, res) => {
   res.json({ ok: true });
 });
 
+const passwordForgotBody = z.object({ email: emailField });
+
 app.post('/api/auth/password/forgot', async (req, res) => {
-  const schema = z.object({ email: z.string().email() });
-  const body = schema.parse(req.body);
-  const email = body.email.toLowerCase();
+  const body = passwordForgotBody.parse(req.body);
+  const { email } = body;
   const user = await prisma.user.findUnique({ where: { email } });
   if (!user) return res.json({ ok: true });
 
@@ -241,16 +283,17 @@ app.post('/api/auth/password/forgot', async (req, res) => {
   res.json({ ok: true });
 });
 
+const passwordResetBody = z.object({ token: z.string().min(10), password: z.string().min(8) });
+
 app.post('/api/auth/password/reset', async (req, res) => {
-  const schema = z.object({ token: z.string().min(10), password: z.string().min(8) });
-  const body = schema.parse(req.body);
+  const body = passwordResetBody.parse(req.body);
   const tokenHash = sha256(body.token);
   const reset = await prisma.passwordResetToken.findUnique({ where: { tokenHash } });
   if (!reset || reset.consumedAt || reset.expiresAt.getTime() <= Date.now()) {
     return res.status(400).json({ error: 'INVALID_RESET_TOKEN' });
   }
 
-  const passwordHash = await bcrypt.hash(body.password, 12);
+  const passwordHash = await hashPassword(body.password);
   await prisma.$transaction([
     prisma.user.update({ where: { id: reset.userId }, data: { passwordHash } }),
     prisma.passwordResetToken.update({ where: { id: reset.id }, data: { consumedAt: new Date() } }),
@@ -271,8 +314,7 @@ app.get('/api/events/stream', requireAuth, async (req, res) => {
     Connection: 'keep-alive',
   });
 
-  res.write(`event: hello\n`);
-  res.write(`data: ${JSON.stringify({ ok: true })}\n\n`);
+  res.write(SSE_HELLO_FRAME);
 
   sseAddClient({ id: clientId, orgId: auth.organizationId, res });
 
@@ -281,10 +323,35 @@ app.get('/api/events/stream', requireAuth, async (req, res) => {
   });
 });
 
-setInterval(() => ssePing(), 25_000).unref();
+const ssePingTimer = setInterval(() => ssePing(), 25_000).unref();
 
 // ---- Client API ----
 
+const limitQuerySchema = z.coerce
+  .number()
+  .int()
+  .positive()
+  .transform((n) => Math.min(n, 200))
+  .catch(50);
+
+function toActivityItem(e: ActivityEvent) {
+  return {
+    id: e.id,
+    type: e.type,
+    title: e.title,
+    description: e.description,
+    timestamp: e.createdAt.toISOString(),
+    status: e.status,
+    metadata: e.metadata ?? undefined,
+  };
+}
+
+async function recordActivity(data: Prisma.EventUncheckedCreateInput) {
+  const event = await prisma.event.create({ data });
+  sseBroadcast(data.organizationId, { type: 'activity', payload: toActivityItem(event) });
+  return event;
+}
+
 app.get('/api/client/overview', requireAuth, requirePermission('dashboard:view'), async (req, res) => {
   const auth = (req as AuthedRequest).auth;
 
@@ -298,12 +365,8 @@ app.get('/api/client/overview', requireAuth, requirePermission('dashboard:view')
     prisma.integration.findMany({ where: { organizationId: auth.organizationId } }),
   ]);
 
-  const systemStatus =
-    workflows.some((w) => w.healthStatus === 'error') || integrations.some((i) => i.healthStatus === 'error')
-      ? 'error'
-      : workflows.some((w) => w.healthStatus === 'warning') || integrations.some((i) => i.healthStatus === 'warning')
-        ? 'warning'
-        : 'healthy';
+  const healthStatuses = new Set([...workflows, ...integrations].map((x) => x.healthStatus));
+  const systemStatus = healthStatuses.has('error') ? 'error' : healthStatuses.has('warning') ? 'warning' : 'healthy';
 
   const conversations = workflows.find((w) => (w.config as any)?.trigger === 'webhook:whatsapp')?.runCount ?? 0;
   const leads = Math.round(conversations * 0.12);
@@ -320,21 +383,13 @@ app.get('/api/client/overview', requireAuth, requirePermission('dashboard:view')
       automationsActive: workflows.filter((w) => w.status === 'active').length,
     },
     systemStatus,
-    recentActivity: events.map((e) => ({
-      id: e.id,
-      type: e.type,
-      title: e.title,
-      description: e.description,
-      timestamp: e.createdAt.toISOString(),
-      status: e.status,
-      metadata: e.metadata ?? undefined,
-    })),
+    recentActivity: events.map(toActivityItem),
   });
 });
 
 app.get('/api/client/activity', requireAuth, requirePermission('dashboard:view'), async (req, res) => {
   const auth = (req as AuthedRequest).auth;
-  const limit = z.coerce.number().int().positive().max(200).default(50).parse(req.query.limit ?? '50');
+  const limit = limitQuerySchema.parse(req.query.limit);
 
   const events = await prisma.event.findMany({
     where: { organizationId: auth.organizationId },
@@ -343,15 +398,7 @@ app.get('/api/client/activity', requireAuth, requirePermission('dashboard:view')
   });
 
   res.json({
-    events: events.map((e) => ({
-      id: e.id,
-      type: e.type,
-      title: e.title,
-      description: e.description,
-      timestamp: e.createdAt.toISOString(),
-      status: e.status,
-      metadata: e.metadata ?? undefined,
-    })),
+    events: events.map(toActivityItem),
   });
 });
 
@@ -376,7 +423,7 @@ app.get('/api/client/workflows', requireAuth, requirePermission('automation:view
 
 app.post('/api/client/workflows/:id/toggle', requireAuth, requirePermission('automation:edit'), async (req, res) => {
   const auth = (req as AuthedRequest).auth;
-  const id = z.string().parse(req.params.id);
+  const id = req.params.id;
   const wf = await prisma.workflow.findFirst({ where: { id, organizationId: auth.organizationId } });
   if (!wf) return res.status(404).json({ error: 'NOT_FOUND' });
   const status = wf.status === 'active' ? 'paused' : 'active';
@@ -386,7 +433,7 @@ app.post('/api/client/workflows/:id/toggle', requireAuth, requirePermission('aut
 
 app.post('/api/client/workflows/:id/run', requireAuth, requirePermission('automation:run'), async (req, res) => {
   const auth = (req as AuthedRequest).auth;
-  const id = z.string().parse(req.params.id);
+  const id = req.params.id;
   const wf = await prisma.workflow.findFirst({ where: { id, organizationId: auth.organizationId } });
   if (!wf) return res.status(404).json({ error: 'NOT_FOUND' });
 
@@ -395,48 +442,56 @@ app.post('/api/client/workflows/:id/run', requireAuth, requirePermission('automa
     data: { lastRunAt: new Date(), runCount: { increment: 1 }, status: wf.status === 'error' ? 'warning' : wf.status },
   });
 
-  const event = await prisma.event.create({
-    data: {
-      organizationId: auth.organizationId,
-      actorUserId: auth.userId,
-      type: 'automation',
-      title: updated.name,
-      description: 'Ejecución manual disparada desde el dashboard',
-      status: 'success',
-      metadata: { workflowId: updated.id },
-    },
+  await recordActivity({
+    organizationId: auth.organizationId,
+    actorUserId: auth.userId,
+    type: 'automation',
+    title: updated.name,
+    description: 'Ejecución manual disparada desde el dashboard',
+    status: 'success',
+    metadata: { workflowId: updated.id },
   });
-  sseBroadcast(auth.organizationId, { type: 'activity', payload: { id: event.id, type: event.type, title: event.title, description: event.description, timestamp: event.createdAt.toISOString(), status: event.status, metadata: event.metadata } });
 
   res.json({ ok: true });
 });
 
 app.post('/api/client/workflows/:id/repair', requireAuth, requirePermission('automation:edit'), async (req, res) => {
   const auth = (req as AuthedRequest).auth;
-  const id = z.string().parse(req.params.id);
+  const id = req.params.id;
   const wf = await prisma.workflow.findFirst({ where: { id, organizationId: auth.organizationId } });
   if (!wf) return res.status(404).json({ error: 'NOT_FOUND' });
   await prisma.workflow.update({ where: { id }, data: { status: 'active', healthStatus: 'healthy' } });
   res.json({ ok: true });
 });
 
+const TASK_STATUS_BY_RUN_STATUS: Record<TaskRunStatus, 'running' | 'completed' | 'failed' | 'idle'> = {
+  awaiting_approval: 'running',
+  queued: 'running',
+  running: 'running',
+  completed: 'completed',
+  failed: 'failed',
+  cancelled: 'idle',
+};
+
 app.get('/api/client/tasks', requireAuth, requirePermission('tasks:view'), async (req, res) => {
   const auth = (req as AuthedRequest).auth;
-  const tasks = await prisma.task.findMany({ where: { organizationId: auth.organizationId }, orderBy: { createdAt: 'asc' } });
-  const runs = await prisma.taskRun.findMany({
-    where: { organizationId: auth.organizationId, taskId: { in: tasks.map((t) => t.id) } },
-    orderBy: { createdAt: 'desc' },
-    take: 200,
-  });
-  const steps = await prisma.taskStep.findMany({
-    where: { organizationId: auth.organizationId, taskRunId: { in: runs.map((r) => r.id) } },
-    orderBy: { createdAt: 'asc' },
-  });
+  const [tasks, runs] = await Promise.all([
+    prisma.task.findMany({ where: { organizationId: auth.organizationId }, orderBy: { createdAt: 'asc' } }),
+    prisma.taskRun.findMany({
+      where: { organizationId: auth.organizationId },
+      orderBy: { createdAt: 'desc' },
+      take: 200,
+    }),
+  ]);
 
   const lastRunByTask = new Map<string, (typeof runs)[number]>();
   for (const r of runs) {
     if (!lastRunByTask.has(r.taskId)) lastRunByTask.set(r.taskId, r);
   }
+  const steps = await prisma.taskStep.findMany({
+    where: { taskRunId: { in: [...lastRunByTask.values()].map((r) => r.id) } },
+    orderBy: { createdAt: 'asc' },
+  });
   const stepsByRun = new Map<string, typeof steps>();
   for (const s of steps) {
     const existing = stepsByRun.get(s.taskRunId) ?? [];
@@ -448,15 +503,7 @@ app.get('/api/client/tasks', requireAuth, requirePermission('tasks:view'), async
     tasks: tasks.map((t) => {
       const lastRun = lastRunByTask.get(t.id) ?? null;
       const lastRunSteps = lastRun ? stepsByRun.get(lastRun.id) ?? [] : [];
-      const status = t.isPaused
-        ? 'paused'
-        : lastRun && (lastRun.status === 'running' || lastRun.status === 'queued' || lastRun.status === 'awaiting_approval')
-          ? 'running'
-          : lastRun?.status === 'completed'
-            ? 'completed'
-            : lastRun?.status === 'failed'
-              ? 'failed'
-              : 'idle';
+      const status = t.isPaused ? 'paused' : lastRun ? TASK_STATUS_BY_RUN_STATUS[lastRun.status] : 'idle';
       return {
         id: t.id,
         name: t.name,
@@ -491,15 +538,16 @@ app.get('/api/client/tasks', requireAuth, requirePermission('tasks:view'), async
   });
 });
 
+const createTaskBody = z.object({
+  name: z.string().min(2),
+  description: z.string().min(2),
+  schedule: z.string().min(1),
+  requiresApproval: z.boolean().optional().default(false),
+});
+
 app.post('/api/client/tasks', requireAuth, requirePermission('tasks:create'), async (req, res) => {
   const auth = (req as AuthedRequest).auth;
-  const schema = z.object({
-    name: z.string().min(2),
-    description: z.string().min(2),
-    schedule: z.string().min(1),
-    requiresApproval: z.boolean().optional().default(false),
-  });
-  const body = schema.parse(req.body);
+  const body = createTaskBody.parse(req.body);
 
   const task = await prisma.task.create({
     data: {
@@ -511,28 +559,14 @@ app.post('/api/client/tasks', requireAuth, requirePermission('tasks:create'), as
     },
   });
 
-  const event = await prisma.event.create({
-    data: {
-      organizationId: auth.organizationId,
-      actorUserId: auth.userId,
-      type: 'task',
-      title: 'Nueva misión creada',
-      description: task.name,
-      status: 'success',
-      metadata: { taskId: task.id },
-    },
-  });
-  sseBroadcast(auth.organizationId, {
-    type: 'activity',
-    payload: {
-      id: event.id,
-      type: event.type,
-      title: event.title,
-      description: event.description,
-      timestamp: event.createdAt.toISOString(),
-      status: event.status,
-      metadata: event.metadata,
-    },
+  await recordActivity({
+    organizationId: auth.organizationId,
+    actorUserId: auth.userId,
+    type: 'task',
+    title: 'Nueva misión creada',
+    description: task.name,
+    status: 'success',
+    metadata: { taskId: task.id },
   });
 
   res.json({ ok: true, taskId: task.id });
@@ -540,33 +574,19 @@ app.post('/api/client/tasks', requireAuth, requirePermission('tasks:create'), as
 
 app.post('/api/client/tasks/:id/toggle-pause', requireAuth, requirePermission('tasks:edit'), async (req, res) => {
   const auth = (req as AuthedRequest).auth;
-  const id = z.string().parse(req.params.id);
+  const id = req.params.id;
   const task = await prisma.task.findFirst({ where: { id, organizationId: auth.organizationId } });
   if (!task) return res.status(404).json({ error: 'NOT_FOUND' });
 
   const updated = await prisma.task.update({ where: { id }, data: { isPaused: !task.isPaused } });
-  const event = await prisma.event.create({
-    data: {
-      organizationId: auth.organizationId,
-      actorUserId: auth.userId,
-      type: 'task',
-      title: updated.isPaused ? 'Misión pausada' : 'Misión reanudada',
-      description: updated.name,
-      status: 'success',
-      metadata: { taskId: updated.id, isPaused: updated.isPaused },
-    },
-  });
-  sseBroadcast(auth.organizationId, {
-    type: 'activity',
-    payload: {
-      id: event.id,
-      type: event.type,
-      title: event.title,
-      description: event.description,
-      timestamp: event.createdAt.toISOString(),
-      status: event.status,
-      metadata: event.metadata,
-    },
+  await recordActivity({
+    organizationId: auth.organizationId,
+    actorUserId: auth.userId,
+    type: 'task',
+    title: updated.isPaused ? 'Misión pausada' : 'Misión reanudada',
+    description: updated.name,
+    status: 'success',
+    metadata: { taskId: updated.id, isPaused: updated.isPaused },
   });
 
   res.json({ ok: true, isPaused: updated.isPaused });
@@ -574,24 +594,17 @@ app.post('/api/client/tasks/:id/toggle-pause', requireAuth, requirePermission('t
 
 app.get('/api/client/task-runs', requireAuth, requirePermission('tasks:view'), async (req, res) => {
   const auth = (req as AuthedRequest).auth;
-  const limit = z.coerce.number().int().positive().max(200).default(50).parse(req.query.limit ?? '50');
+  const limit = limitQuerySchema.parse(req.query.limit);
   const taskId = req.query.taskId ? z.string().parse(req.query.taskId) : null;
 
   const runs = await prisma.taskRun.findMany({
     where: { organizationId: auth.organizationId, ...(taskId ? { taskId } : {}) },
     orderBy: { createdAt: 'desc' },
     take: limit,
+    include: {
+      steps: { orderBy: { createdAt: 'asc' }, select: { id: true, name: true, status: true, progress: true } },
+    },
   });
-  const steps = await prisma.taskStep.findMany({
-    where: { organizationId: auth.organizationId, taskRunId: { in: runs.map((r) => r.id) } },
-    orderBy: { createdAt: 'asc' },
-  });
-  const stepsByRun = new Map<string, typeof steps>();
-  for (const s of steps) {
-    const existing = stepsByRun.get(s.taskRunId) ?? [];
-    existing.push(s);
-    stepsByRun.set(s.taskRunId, existing);
-  }
 
   res.json({
     taskRuns: runs.map((r) => ({
@@ -601,105 +614,106 @@ app.get('/api/client/task-runs', requireAuth, requirePermission('tasks:view'), a
       startedAt: (r.startedAt ?? r.createdAt).toISOString(),
       completedAt: r.completedAt?.toISOString() ?? null,
       progress: r.progress,
-      steps: (stepsByRun.get(r.id) ?? []).map((s) => ({ id: s.id, name: s.name, status: s.status, progress: s.progress })),
+      steps: r.steps,
       evidence: (r.evidence as any) ?? undefined,
     })),
   });
 });
 
+const RUN_STEP_TEMPLATE = [
+  { name: 'Inicializando', status: 'running', progress: 0 },
+  { name: 'Procesando', status: 'pending', progress: 0 },
+  { name: 'Finalizando', status: 'pending', progress: 0 },
+] as const;
+
+const SIMULATION_CHECKPOINTS = [
+  { progress: 10, step: 0, stepProgress: 20, message: 'Inicializando' },
+  { progress: 30, step: 0, stepProgress: 100, message: 'Inicialización completa' },
+  { progress: 60, step: 1, stepProgress: 60, message: 'Procesando' },
+  { progress: 90, step: 2, stepProgress: 80, message: 'Finalizando' },
+  { progress: 100, step: 2, stepProgress: 100, message: 'Completado' },
+] as const;
+
+const SIMULATION_EVIDENCE = {
+  screenshots: ['/evidence/before.png', '/evidence/after.png'],
+  logs: ['Ejecución completada', 'Resultado verificado'],
+};
+
 async function startTaskRunSimulation(params: { orgId: string; runId: string; taskName: string }) {
   // Simple in-memory simulation
-  const checkpoints = [
-    { progress: 10, step: 0, stepProgress: 20, message: 'Inicializando' },
-    { progress: 30, step: 0, stepProgress: 100, message: 'Inicialización completa' },
-    { progress: 60, step: 1, stepProgress: 60, message: 'Procesando' },
-    { progress: 90, step: 2, stepProgress: 80, message: 'Finalizando' },
-    { progress: 100, step: 2, stepProgress: 100, message: 'Completado' },
-  ];
-
-  for (const [idx, c] of checkpoints.entries()) {
+  for (const [idx, c] of SIMULATION_CHECKPOINTS.entries()) {
     await new Promise((r) => setTimeout(r, 1200));
-
-    const run = await prisma.taskRun.update({
-      where: { id: params.runId },
-      data: {
-        status: c.progress >= 100 ? 'completed' : 'running',
-        progress: c.progress,
-        startedAt: idx === 0 ? new Date() : undefined,
-        completedAt: c.progress >= 100 ? new Date() : null,
-        evidence:
-          c.progress >= 100
-            ? {
-                screenshots: ['/evidence/before.png', '/evidence/after.png'],
-                logs: ['Ejecución completada', 'Resultado verificado'],
-              }
-            : undefined,
-      },
-    });
-
-    const runSteps = await prisma.taskStep.findMany({
-      where: { taskRunId: params.runId },
-      orderBy: { createdAt: 'asc' },
-    });
     const now = new Date();
-    for (const [i, step] of runSteps.entries()) {
-      if (i < c.step) {
-        await prisma.taskStep.update({
-          where: { id: step.id },
-          data: {
-            status: 'completed',
-            progress: 100,
-            startedAt: step.startedAt ?? now,
-            completedAt: step.completedAt ?? now,
-          },
-        });
-        continue;
-      }
 
-      if (i === c.step) {
-        const existingLogs = Array.isArray(step.logs) ? (step.logs as Prisma.InputJsonArray) : [];
-        const nextLogs: Prisma.InputJsonArray = [...existingLogs, `[${now.toISOString()}] ${c.message}`];
-        await prisma.taskStep.update({
+    const [run, runSteps] = await Promise.all([
+      prisma.taskRun.update({
+        where: { id: params.runId },
+        data: {
+          status: c.progress >= 100 ? 'completed' : 'running',
+          progress: c.progress,
+          startedAt: idx === 0 ? now : undefined,
+          completedAt: c.progress >= 100 ? now : null,
+          evidence: c.progress >= 100 ? SIMULATION_EVIDENCE : undefined,
+        },
+        select: { id: true, progress: true, status: true },
+      }),
+      prisma.taskStep.findMany({
+        where: { taskRunId: params.runId },
+        orderBy: { createdAt: 'asc' },
+        select: { id: true, name: true, startedAt: true, completedAt: true, logs: true },
+      }),
+    ]);
+
+    await Promise.all(
+      runSteps.map((step, i) => {
+        if (i < c.step) {
+          return prisma.taskStep.update({
+            where: { id: step.id },
+            data: {
+              status: 'completed',
+              progress: 100,
+              startedAt: step.startedAt ?? now,
+              completedAt: step.completedAt ?? now,
+            },
+          });
+        }
+
+        if (i === c.step) {
+          const existingLogs = Array.isArray(step.logs) ? (step.logs as Prisma.InputJsonArray) : [];
+          const nextLogs: Prisma.InputJsonArray = [...existingLogs, `[${now.toISOString()}] ${c.message}`];
+          return prisma.taskStep.update({
+            where: { id: step.id },
+            data: {
+              status: c.stepProgress >= 100 ? 'completed' : 'running',
+              progress: c.stepProgress,
+              startedAt: step.startedAt ?? now,
+              completedAt: c.stepProgress >= 100 ? now : null,
+              logs: nextLogs,
+            },
+          });
+        }
+
+        return prisma.taskStep.update({
           where: { id: step.id },
-          data: {
-            status: c.stepProgress >= 100 ? 'completed' : 'running',
-            progress: c.stepProgress,
-            startedAt: step.startedAt ?? now,
-            completedAt: c.stepProgress >= 100 ? now : null,
-            logs: nextLogs,
-          },
+          data: { status: 'pending', progress: 0 },
         });
-
-        sseBroadcast(params.orgId, {
-          type: 'task_log',
-          payload: {
-            runId: params.runId,
-            stepId: step.id,
-            stepName: step.name,
-            message: c.message,
-            timestamp: now.toISOString(),
-          },
-        });
-        continue;
-      }
-
-      await prisma.taskStep.update({
-        where: { id: step.id },
-        data: { status: 'pending', progress: 0 },
+      }),
+    );
+
+    const currentStep = runSteps[c.step];
+    if (currentStep) {
+      sseBroadcast(params.orgId, {
+        type: 'task_log',
+        payload: {
+          runId: params.runId,
+          stepId: currentStep.id,
+          stepName: currentStep.name,
+          message: c.message,
+          timestamp: now.toISOString(),
+        },
       });
     }
 
-    const event = await prisma.event.create({
-      data: {
-        organizationId: params.orgId,
-        type: 'task',
-        title: params.taskName,
-        description: `Progreso ${c.progress}% - ${c.message}`,
-        status: c.progress >= 100 ? 'success' : 'pending',
-        metadata: { runId: run.id, progress: run.progress },
-      },
-    });
-
     sseBroadcast(params.orgId, {
       type: 'task_progress',
       payload: {
@@ -708,25 +722,30 @@ async function startTaskRunSimulation(params: { orgId: string; runId: string; ta
         status: run.status,
       },
     });
-    sseBroadcast(params.orgId, {
-      type: 'activity',
-      payload: {
-        id: event.id,
-        type: event.type,
-        title: event.title,
-        description: event.description,
-        timestamp: event.createdAt.toISOString(),
-        status: event.status,
-        metadata: event.metadata,
-      },
+    await recordActivity({
+      organizationId: params.orgId,
+      type: 'task',
+      title: params.taskName,
+      description: `Progreso ${c.progress}% - ${c.message}`,
+      status: c.progress >= 100 ? 'success' : 'pending',
+      metadata: { runId: run.id, progress: run.progress },
     });
   }
 }
 
+async function launchTaskRun(params: { orgId: string; runId: string; taskName: string }) {
+  await prisma.taskStep.createMany({
+    data: RUN_STEP_TEMPLATE.map((step) => ({ ...step, organizationId: params.orgId, taskRunId: params.runId })),
+    skipDuplicates: true,
+  });
+  void startTaskRunSimulation(params);
+}
+
+const runTaskBody = z.object({ taskId: z.string().min(1) });
+
 app.post('/api/client/tasks/run', requireAuth, requirePermission('tasks:run'), async (req, res) => {
   const auth = (req as AuthedRequest).auth;
-  const schema = z.object({ taskId: z.string().min(1) });
-  const body = schema.parse(req.body);
+  const body = runTaskBody.parse(req.body);
 
   const task = await prisma.task.findFirst({ where: { id: body.taskId, organizationId: auth.organizationId } });
   if (!task) return res.status(404).json({ error: 'NOT_FOUND' });
@@ -757,18 +776,15 @@ app.post('/api/client/tasks/run', requireAuth, requirePermission('tasks:run'), a
       },
     });
 
-    const event = await prisma.event.create({
-      data: {
-        organizationId: auth.organizationId,
-        actorUserId: auth.userId,
-        type: 'approval',
-        title: 'Aprobación requerida',
-        description: `${task.name} espera aprobación`,
-        status: 'pending',
-        metadata: { approvalId: approval.id },
-      },
+    await recordActivity({
+      organizationId: auth.organizationId,
+      actorUserId: auth.userId,
+      type: 'approval',
+      title: 'Aprobación requerida',
+      description: `${task.name} espera aprobación`,
+      status: 'pending',
+      metadata: { approvalId: approval.id },
     });
-    sseBroadcast(auth.organizationId, { type: 'activity', payload: { id: event.id, type: event.type, title: event.title, description: event.description, timestamp: event.createdAt.toISOString(), status: event.status, metadata: event.metadata } });
 
     return res.json({ ok: true, awaitingApproval: true, approvalId: approval.id, runId: run.id });
   }
@@ -783,67 +799,52 @@ app.post('/api/client/tasks/run', requireAuth, requirePermission('tasks:run'), a
       progress: 0,
     },
   });
-  await prisma.taskStep.createMany({
-    data: [
-      { organizationId: auth.organizationId, taskRunId: run.id, name: 'Inicializando', status: 'running', progress: 0 },
-      { organizationId: auth.organizationId, taskRunId: run.id, name: 'Procesando', status: 'pending', progress: 0 },
-      { organizationId: auth.organizationId, taskRunId: run.id, name: 'Finalizando', status: 'pending', progress: 0 },
-    ],
-  });
-
-  void startTaskRunSimulation({ orgId: auth.organizationId, runId: run.id, taskName: task.name });
+  await launchTaskRun({ orgId: auth.organizationId, runId: run.id, taskName: task.name });
 
   res.json({ ok: true, runId: run.id });
 });
 
+const approveBody = z.object({ approvalId: z.string().min(1), decision: z.enum(['approve', 'reject']) });
+
 app.post('/api/client/approve', requireAuth, requirePermission('approvals:approve'), async (req, res) => {
   const auth = (req as AuthedRequest).auth;
-  const schema = z.object({ approvalId: z.string().min(1), decision: z.enum(['approve', 'reject']) });
-  const body = schema.parse(req.body);
+  const body = approveBody.parse(req.body);
 
   const approval = await prisma.approval.findFirst({
     where: { id: body.approvalId, organizationId: auth.organizationId, status: 'pending' },
   });
   if (!approval) return res.status(404).json({ error: 'NOT_FOUND' });
 
+  const now = new Date();
   const newStatus = body.decision === 'approve' ? 'approved' : 'rejected';
   const updated = await prisma.approval.update({
     where: { id: approval.id },
-    data: { status: newStatus, decidedByUserId: auth.userId, decidedAt: new Date() },
+    data: { status: newStatus, decidedByUserId: auth.userId, decidedAt: now },
   });
 
   if (updated.taskRunId && newStatus === 'approved') {
-    const run = await prisma.taskRun.findUnique({ where: { id: updated.taskRunId } });
+    const run = await prisma.taskRun.findUnique({
+      where: { id: updated.taskRunId },
+      select: { id: true, task: { select: { name: true } } },
+    });
     if (run) {
-      const task = await prisma.task.findUnique({ where: { id: run.taskId } });
       await prisma.taskRun.update({
         where: { id: run.id },
-        data: { status: 'running', startedAt: new Date(), progress: 0 },
+        data: { status: 'running', startedAt: now, progress: 0 },
       });
-      await prisma.taskStep.createMany({
-        data: [
-          { organizationId: auth.organizationId, taskRunId: run.id, name: 'Inicializando', status: 'running', progress: 0 },
-          { organizationId: auth.organizationId, taskRunId: run.id, name: 'Procesando', status: 'pending', progress: 0 },
-          { organizationId: auth.organizationId, taskRunId: run.id, name: 'Finalizando', status: 'pending', progress: 0 },
-        ],
-        skipDuplicates: true,
-      });
-      void startTaskRunSimulation({ orgId: auth.organizationId, runId: run.id, taskName: task?.name ?? 'Tarea' });
+      await launchTaskRun({ orgId: auth.organizationId, runId: run.id, taskName: run.task.name });
     }
   }
 
-  const event = await prisma.event.create({
-    data: {
-      organizationId: auth.organizationId,
-      actorUserId: auth.userId,
-      type: 'approval',
-      title: `Aprobación ${newStatus === 'approved' ? 'aprobada' : 'rechazada'}`,
-      description: updated.title,
-      status: newStatus === 'approved' ? 'success' : 'warning',
-      metadata: { approvalId: updated.id, status: updated.status },
-    },
+  await recordActivity({
+    organizationId: auth.organizationId,
+    actorUserId: auth.userId,
+    type: 'approval',
+    title: `Aprobación ${newStatus === 'approved' ? 'aprobada' : 'rechazada'}`,
+    description: updated.title,
+    status: newStatus === 'approved' ? 'success' : 'warning',
+    metadata: { approvalId: updated.id, status: updated.status },
   });
-  sseBroadcast(auth.organizationId, { type: 'activity', payload: { id: event.id, type: event.type, title: event.title, description: event.description, timestamp: event.createdAt.toISOString(), status: event.status, metadata: event.metadata } });
 
   res.json({ ok: true });
 });
@@ -875,23 +876,27 @@ app.get('/api/client/integrations', requireAuth, requirePermission('integrations
   const auth = (req as AuthedRequest).auth;
   const integrations = await prisma.integration.findMany({ where: { organizationId: auth.organizationId }, orderBy: { createdAt: 'asc' } });
   res.json({
-    integrations: integrations.map((i) => ({
-      id: i.id,
-      name: i.name,
-      provider: i.provider,
-      status: i.status,
-      lastSync: i.lastSyncAt?.toISOString() ?? null,
-      healthStatus: i.healthStatus,
-      config: i.config,
-      credentials: i.credentials,
-      estimatedCost: i.estimatedCost ?? undefined,
-    })),
+    integrations: integrations.map((i) => {
+      // Only expose the credential fields the dashboard reads, never stored secrets
+      const credentials = (i.credentials as any) ?? {};
+      return {
+        id: i.id,
+        name: i.name,
+        provider: i.provider,
+        status: i.status,
+        lastSync: i.lastSyncAt?.toISOString() ?? null,
+        healthStatus: i.healthStatus,
+        config: i.config,
+        credentials: { hasCredentials: Boolean(credentials.hasCredentials), expiresAt: credentials.expiresAt ?? undefined },
+        estimatedCost: i.estimatedCost ?? undefined,
+      };
+    }),
   });
 });
 
 app.post('/api/client/integrations/:id/test', requireAuth, requirePermission('integrations:view'), async (req, res) => {
   const auth = (req as AuthedRequest).auth;
-  const id = z.string().parse(req.params.id);
+  const id = req.params.id;
   const integration = await prisma.integration.findFirst({ where: { id, organizationId: auth.organizationId } });
   if (!integration) return res.status(404).json({ error: 'NOT_FOUND' });
 
@@ -901,47 +906,34 @@ app.post('/api/client/integrations/:id/test', requireAuth, requirePermission('in
 
 app.post('/api/client/integrations/:id/disconnect', requireAuth, requirePermission('integrations:connect'), async (req, res) => {
   const auth = (req as AuthedRequest).auth;
-  const id = z.string().parse(req.params.id);
+  const id = req.params.id;
   const integration = await prisma.integration.findFirst({ where: { id, organizationId: auth.organizationId } });
   if (!integration) return res.status(404).json({ error: 'NOT_FOUND' });
   await prisma.integration.update({ where: { id }, data: { status: 'disconnected' } });
 
-  const event = await prisma.event.create({
-    data: {
-      organizationId: auth.organizationId,
-      actorUserId: auth.userId,
-      type: 'integration',
-      title: 'Integración desconectada',
-      description: integration.name,
-      status: 'warning',
-      metadata: { integrationId: integration.id },
-    },
-  });
-  sseBroadcast(auth.organizationId, {
-    type: 'activity',
-    payload: {
-      id: event.id,
-      type: event.type,
-      title: event.title,
-      description: event.description,
-      timestamp: event.createdAt.toISOString(),
-      status: event.status,
-      metadata: event.metadata,
-    },
+  await recordActivity({
+    organizationId: auth.organizationId,
+    actorUserId: auth.userId,
+    type: 'integration',
+    title: 'Integración desconectada',
+    description: integration.name,
+    status: 'warning',
+    metadata: { integrationId: integration.id },
   });
   res.json({ ok: true });
 });
 
+const integrationConfigBody = z.object({
+  appIconUrl: z.string().url().nullable().optional(),
+  privacyPolicyUrl: z.string().url().nullable().optional(),
+  userDataDeletionUrl: z.string().url().nullable().optional(),
+  category: z.string().min(2).nullable().optional(),
+});
+
 app.patch('/api/client/integrations/:id/config', requireAuth, requirePermission('integrations:edit'), async (req, res) => {
   const auth = (req as AuthedRequest).auth;
-  const id = z.string().parse(req.params.id);
-  const schema = z.object({
-    appIconUrl: z.string().url().nullable().optional(),
-    privacyPolicyUrl: z.string().url().nullable().optional(),
-    userDataDeletionUrl: z.string().url().nullable().optional(),
-    category: z.string().min(2).nullable().optional(),
-  });
-  const body = schema.parse(req.body);
+  const id = req.params.id;
+  const body = integrationConfigBody.parse(req.body);
 
   const integration = await prisma.integration.findFirst({ where: { id, organizationId: auth.organizationId } });
   if (!integration) return res.status(404).json({ error: 'NOT_FOUND' });
@@ -950,28 +942,14 @@ app.patch('/api/client/integrations/:id/config', requireAuth, requirePermission(
   const merged = { ...config, ...body };
   await prisma.integration.update({ where: { id }, data: { config: merged } });
 
-  const event = await prisma.event.create({
-    data: {
-      organizationId: auth.organizationId,
-      actorUserId: auth.userId,
-      type: 'integration',
-      title: 'Requisitos actualizados',
-      description: integration.name,
-      status: 'success',
-      metadata: { integrationId: integration.id },
-    },
-  });
-  sseBroadcast(auth.organizationId, {
-    type: 'activity',
-    payload: {
-      id: event.id,
-      type: event.type,
-      title: event.title,
-      description: event.description,
-      timestamp: event.createdAt.toISOString(),
-      status: event.status,
-      metadata: event.metadata,
-    },
+  await recordActivity({
+    organizationId: auth.organizationId,
+    actorUserId: auth.userId,
+    type: 'integration',
+    title: 'Requisitos actualizados',
+    description: integration.name,
+    status: 'success',
+    metadata: { integrationId: integration.id },
   });
 
   res.json({ ok: true });
@@ -999,7 +977,7 @@ app.get('/api/client/users', requireAuth, requirePermission('security:view'), as
 
 app.get('/api/client/audit-logs', requireAuth, requirePermission('security:view'), async (req, res) => {
   const auth = (req as AuthedRequest).auth;
-  const limit = z.coerce.number().int().positive().max(200).default(50).parse(req.query.limit ?? '50');
+  const limit = limitQuerySchema.parse(req.query.limit);
   const logs = await prisma.auditLog.findMany({
     where: { organizationId: auth.organizationId },
     include: { actor: true },
@@ -1067,14 +1045,22 @@ app.get('/api/admin/users', requireAuth, requirePermission('admin:impersonate'),
   });
 });
 
+const ADMIN_METRICS_TTL_MS = 30_000;
+let adminMetricsCache: { expiresAt: number; body: { orgs: number; users: number; taskRuns: number; events: number } } | null =
+  null;
+
 app.get('/api/admin/metrics', requireAuth, requirePermission('admin:metrics'), async (_req, res) => {
+  if (adminMetricsCache && adminMetricsCache.expiresAt > Date.now()) return res.json(adminMetricsCache.body);
+
   const [orgs, users, runs, events] = await Promise.all([
     prisma.organization.count(),
     prisma.user.count(),
     prisma.taskRun.count(),
     prisma.event.count(),
   ]);
-  res.json({ orgs, users, taskRuns: runs, events });
+  const body = { orgs, users, taskRuns: runs, events };
+  adminMetricsCache = { expiresAt: Date.now() + ADMIN_METRICS_TTL_MS, body };
+  res.json(body);
 });
 
 app.get('/api/admin/logs', requireAuth, requirePermission('admin:logs'), async (_req, res) => {
@@ -1097,13 +1083,14 @@ app.get('/api/admin/logs', requireAuth, requirePermission('admin:logs'), async (
   });
 });
 
+const impersonateBody = z.object({
+  userId: z.string().nullable().optional(),
+  organizationId: z.string().nullable().optional(),
+});
+
 app.post('/api/admin/impersonate', requireAuth, requirePermission('admin:impersonate'), async (req, res) => {
   const auth = (req as AuthedRequest).auth;
-  const schema = z.object({
-    userId: z.string().nullable().optional(),
-    organizationId: z.string().nullable().optional(),
-  });
-  const body = schema.parse(req.body);
+  const body = impersonateBody.parse(req.body);
 
   const session = await prisma.session.findUnique({ where: { id: auth.sessionId } });
   if (!session) return res.status(401).json({ error: 'UNAUTHENTICATED' });
@@ -1145,13 +1132,53 @@ const webDistDir = process.env.WEB_DIST_DIR
 const webIndex = path.join(webDistDir, 'index.html');
 
 if (fs.existsSync(webIndex)) {
-  app.use(express.static(webDistDir));
+  const webIndexHtml = fs.readFileSync(webIndex);
+  app.use('/assets', express.static(path.join(webDistDir, 'assets'), { immutable: true, maxAge: '1y' }));
+  app.use('/assets', (_req, res) => res.sendStatus(404));
+  app.use(express.static(webDistDir, { index: false }));
   app.get('*', (req, res) => {
     if (req.path.startsWith('/api')) return res.status(404).json({ error: 'NOT_FOUND' });
-    res.sendFile(webIndex);
+    res.set('Cache-Control', 'no-cache');
+    res.type('html').send(webIndexHtml);
   });
 }
 
-app.listen(env.PORT, () => {
+prisma.$connect().catch((err) => {
+  console.warn('[db] initial connect failed; will retry on first query', err);
+});
+
+const server = app.listen(env.PORT, () => {
   console.log(`API listo en http://localhost:${env.PORT}`);
+  void checkPasswordHashCost();
 });
+
+// Stay under the platform's stop grace period (10s for docker stop) so the flush still runs
+const SHUTDOWN_DRAIN_TIMEOUT_MS = 7_000;
+
+let shuttingDown = false;
+async function shutdown(signal: NodeJS.Signals) {
+  if (shuttingDown) return;
+  shuttingDown = true;
+  console.log(`[shutdown] ${signal}, closing`);
+
+  clearInterval(ssePingTimer);
+  sseCloseAll();
+  await new Promise<void>((resolve) => {
+    const deadline = setTimeout(() => {
+      console.warn('[shutdown] drain timed out, dropping open connections');
+      server.closeAllConnections();
+      resolve();
+    }, SHUTDOWN_DRAIN_TIMEOUT_MS);
+    deadline.unref();
+    server.close(() => {
+      clearTimeout(deadline);
+      resolve();
+    });
+  });
+  await flushAuditLogs();
+  await prisma.$disconnect().catch(() => {});
+  process.exit(0);
+}
+
+process.once('SIGTERM', (signal) => void shutdown(signal));
+process.once('SIGINT', (signal) => void shutdown(signal));
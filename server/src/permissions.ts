@@ -22,37 +22,39 @@ export type Permission =
   | 'admin:logs'
   | 'admin:impersonate';
 
-export function permissionsForRoles(systemRole: SystemRole, orgRole: OrgRole | null): Permission[] {
-  if (systemRole === 'SUPER_ADMIN') return ['*'];
+const SUPER_ADMIN_PERMISSIONS: readonly Permission[] = Object.freeze(['*'] as Permission[]);
 
-  if (orgRole === 'ORG_ADMIN') {
-    return [
-      'dashboard:view',
-      'automation:view',
-      'automation:edit',
-      'automation:run',
-      'tasks:view',
-      'tasks:create',
-      'tasks:edit',
-      'tasks:run',
-      'integrations:view',
-      'integrations:connect',
-      'integrations:edit',
-      'security:view',
-      'security:manage_users',
-      'approvals:view',
-      'approvals:approve',
-    ];
-  }
+const ORG_ADMIN_PERMISSIONS: readonly Permission[] = Object.freeze([
+  'dashboard:view',
+  'automation:view',
+  'automation:edit',
+  'automation:run',
+  'tasks:view',
+  'tasks:create',
+  'tasks:edit',
+  'tasks:run',
+  'integrations:view',
+  'integrations:connect',
+  'integrations:edit',
+  'security:view',
+  'security:manage_users',
+  'approvals:view',
+  'approvals:approve',
+] as Permission[]);
 
-  return [
-    'dashboard:view',
-    'automation:view',
-    'tasks:view',
-    'tasks:run',
-    'integrations:view',
-    'approvals:view',
-  ];
+const ORG_USER_PERMISSIONS: readonly Permission[] = Object.freeze([
+  'dashboard:view',
+  'automation:view',
+  'tasks:view',
+  'tasks:run',
+  'integrations:view',
+  'approvals:view',
+] as Permission[]);
+
+export function permissionsForRoles(systemRole: SystemRole, orgRole: OrgRole | null): readonly Permission[] {
+  if (systemRole === 'SUPER_ADMIN') return SUPER_ADMIN_PERMISSIONS;
+  if (orgRole === 'ORG_ADMIN') return ORG_ADMIN_PERMISSIONS;
+  return ORG_USER_PERMISSIONS;
 }
 
 export function hasPermission(userPermissions: readonly Permission[], permission: Permission): boolean {
@@ -8,6 +8,9 @@ type Client = {
 
 const clients = new Map<string, Client>();
 
+export const SSE_HELLO_FRAME = `event: hello\ndata: ${JSON.stringify({ ok: true })}\n\n`;
+const SSE_PING_FRAME = `event: ping\ndata: {}\n\n`;
+
 export function sseAddClient(client: Client) {
   clients.set(client.id, client);
 }
@@ -17,18 +20,22 @@ export function sseRemoveClient(id: string) {
 }
 
 export function sseBroadcast(orgId: string, event: { type: string; payload: unknown }) {
-  const data = JSON.stringify(event.payload);
+  const frame = `event: ${event.type}\ndata: ${JSON.stringify(event.payload)}\n\n`;
   for (const c of clients.values()) {
     if (c.orgId !== orgId) continue;
-    c.res.write(`event: ${event.type}\n`);
-    c.res.write(`data: ${data}\n\n`);
+    c.res.write(frame);
   }
 }
 
 export function ssePing() {
   for (const c of clients.values()) {
-    c.res.write(`event: ping\n`);
-    c.res.write(`data: {}\n\n`);
+    c.res.write(SSE_PING_FRAME);
   }
 }
 
+export function sseCloseAll() {
+  for (const c of clients.values()) {
+    c.res.end();
+  }
+  clients.clear();
+}
@@ -4,6 +4,12 @@ export function sha256(input: string): string {
   return crypto.createHash('sha256').update(input).digest('hex');
 }
 
+export function matchesSha256(hexHash: string, input: string): boolean {
+  const expected = Buffer.from(hexHash, 'hex');
+  const actual = crypto.createHash('sha256').update(input).digest();
+  return expected.length === actual.length && crypto.timingSafeEqual(expected, actual);
+}
+
 export function randomToken(bytes = 32): string {
   return crypto.randomBytes(bytes).toString('base64url');
 }